@@ -30,7 +30,7 @@
 import random
 import time
 
-from openocd_tcl_wrapper import OpenOCD
+from openocd_tcl_wrapper import AbstractCommandError, OpenOCD, register_translations, nonstandard_register_lengths
 
 random_stimulus = True
 random_order = False
@@ -40,8 +40,7 @@ def prog_buff_test(cvw):
     cvw.halt()
     pb = ["0x00840413", "0xd2e3ca40", "0x00100073"]
     cvw.write_data("DCSR", hex(0x1 << 15))
-    cvw.write_progbuf(pb)
-    cvw.exec_progbuf()
+    cvw.write_progbuf(pb, execute=True)
 
     cvw.resume()
     print()
@@ -72,30 +71,17 @@ def flow_control_test(cvw):
 
 
 def register_rw_test(cvw):
-    registers = dict.fromkeys(cvw.register_translations.keys(),[])
-    reg_addrs = list(registers.keys())
-
     global XLEN
     XLEN = cvw.LLEN
     global nonstandard_register_lengths
-    nonstandard_register_lengths = cvw.nonstandard_register_lengths
+    nonstandard_register_lengths = dict(nonstandard_register_lengths)  # random_hex updates READDATAM
 
     #time.sleep(70)  # wait for OpenSBI
 
-    cvw.halt()
-
-    # dump data in all registers
-    for r in reg_addrs:
-        try:
-            data = cvw.read_data(r)
-            registers[r] = data
-            print(f"{r}: {data}")
-        except Exception as e:
-            if e.args[0] == "exception":  # Invalid register (not implemented)
-                del registers[r]
-                cvw.clear_abstrcmd_err()
-            else:
-                raise e
+    # halt and dump data in all registers, invalid registers (not implemented) are left out
+    registers = cvw.halt_and_snapshot(register_translations.keys())
+    for r, data in registers.items():
+        print(f"{r}: {data}")
     input("Compare values to ILA, press any key to continue")
 
     # Write random data to all registers
@@ -109,7 +95,7 @@ def register_rw_test(cvw):
             cvw.write_data(r, test_data)
             test_reg_data[r] = test_data
             print(f"Writing {test_data} to {r}")
-        except Exception as e:
+        except AbstractCommandError as e:
             if e.args[0] == "not supported":  # Register is read only
                 del registers[r]
                 cvw.clear_abstrcmd_err()
@@ -25,46 +25,130 @@
 # and limitations under the License.
 #########################################################################################
 
-import math
+import atexit
 import os
 import socket
 import sys
-import time
+from types import MappingProxyType
 
 ENDMSG = b'\x1a'
+SCRIPTSEP = "\x1b"  # separates command results in a batched script (must not be whitespace)
+
+# While Busy, abstractcs is polled inside OpenOCD instead of one round-trip per read.
+# Each round-trip is capped at ABSTRCMD_POLL_READS reads so a hung DM can't stall the TCL server
+ABSTRCMD_POLL_READS = 100
+ABSTRCMD_POLL = (
+    "set abstractcs [capture \"riscv dmi_read 0x16\"]; set polls 1; "
+    f"while {{($abstractcs & 0x1000) && $polls < {ABSTRCMD_POLL_READS}}} "
+    "{set abstractcs [capture \"riscv dmi_read 0x16\"]; incr polls}; "
+    "set abstractcs"
+)
+ABSTRCMD_POLL_SCRIPT = ABSTRCMD_POLL.encode("ascii") + ENDMSG
+# Prebuilt abstractcs read for check_abstrcmderr
+ABSTRACTCS_READ_SCRIPT = b"capture \"riscv dmi_read 0x16\"" + ENDMSG
+# send_script() step that waits for Busy to clear, data0-3 accesses while Busy set CmdErr (dm.sv)
+ABSTRCMD_WAIT = f"[{ABSTRCMD_POLL}]"
+
+# 3.7.1.1 Access Register aarsize field, by access width
+AARSIZE = {32: 2 << 20, 64: 3 << 20, 128: 4 << 20}
+
+# Request halt, check the halted bit, then deassert HaltReq
+HALT_SCRIPT = (
+    "riscv dmi_write 0x10 0x80000001",
+    "riscv dmi_read 0x11",
+    "riscv dmi_write 0x10 0x1",
+)
+
+# Set OPENOCD_TCL_PERSIST=1 to reuse one TCL connection for every `with OpenOCD()` block in a process
+PERSIST_CONNECTION = os.environ.get("OPENOCD_TCL_PERSIST") == "1"
+persistent_tcl = None
+
+class AbstractCommandError(Exception):
+    """Raised when an abstract command reports CmdErr. args[0] is the cmderr_translations string"""
+
 
 class OpenOCD:
     def __init__(self):
-        self.tcl = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcl = None
 
     def __enter__(self):
-        self.tcl.connect(("127.0.0.1", 6666))
+        global persistent_tcl
+        if persistent_tcl and tcl_connected(persistent_tcl):
+            self.tcl, persistent_tcl = persistent_tcl, None
+        else:
+            self.tcl = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.tcl.connect(("127.0.0.1", 6666))
+            # Every command is a small request/response pair, don't let Nagle hold them back
+            self.tcl.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Connections can sit idle for a long time between commands in interactive use
+            self.tcl.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.rxbuf = bytearray()
         self.LLEN = 64 #TODO: find this
+        # LLEN is fixed for the session, precompute the LLEN sized register transfers
+        self.data_regs = ("0x4", "0x5", "0x6", "0x7")[:self.LLEN // 32]
+        self.access_read = self.access_register_command(write=False, regno=0)
+        self.access_write = self.access_register_command(write=True, regno=0)
+        # Registers the hart reported as not implemented, these never change during a session
+        self.unimplemented_regs = set()
+        # Set while step() has left the DCSR step bit set, resume() and __exit__ clear it again
+        self.stepping = False
+        # Last instructions written by write_progbuf, by progbuf index
+        self.progbuf = {}
         return self
 
     def __exit__(self, type, value, traceback):
-        try:
-            self.send("exit")
-        finally:
-            self.tcl.close()
+        global persistent_tcl
+        # The next session starts with stepping unset, don't leave the step bit behind in DCSR.
+        # Skipped when leaving on an exception, the connection may be dead or a reply outstanding
+        if self.stepping and type is None:
+            try:
+                self.clear_step()
+            except BaseException:
+                close_tcl(self.tcl)
+                raise
+        # Only hand the connection on if no reply is left half read
+        if PERSIST_CONNECTION and type is None and not self.rxbuf:
+            if persistent_tcl:
+                close_tcl(persistent_tcl)
+            persistent_tcl = self.tcl
+        else:
+            close_tcl(self.tcl)
 
     def capture(self, cmd):
         return self.send(f"capture \"{cmd}\"")
 
+    def send_script(self, cmds):
+        """Capture a list of commands in a single round-trip to OpenOCD.
+        Commands already wrapped in [] (ABSTRCMD_WAIT) are inserted into the script as is.
+        Returns a list containing the result of each command"""
+        if not cmds:
+            return []
+        script = " ".join(cmd if cmd.startswith("[") else f"[capture \"{cmd}\"]" for cmd in cmds)
+        rsp = self.send(f"join [list {script}] \"\\x1b\"")
+        results = [r.rstrip() for r in rsp.split(SCRIPTSEP)]
+        if len(results) != len(cmds):
+            raise Exception(rsp)
+        for cmd, result in zip(cmds, results):
+            if cmd.startswith("riscv dmi_write") and "Failed" in result:
+                raise Exception(result)
+        return results
+
     def send(self, cmd):
-        data = cmd.encode("ascii") + ENDMSG
-        self.tcl.send(data)
+        """cmd may also be prebuilt bytes that already end in ENDMSG"""
+        if isinstance(cmd, str):
+            cmd = cmd.encode("ascii") + ENDMSG
+        self.tcl.sendall(cmd)
         return self.receive()
 
     def receive(self):
-        data = bytes()
-        while True:
-            byte = self.tcl.recv(1)
-            if byte == ENDMSG:
-                break
-            else:
-                data += byte
-        data = data.decode("ascii").rstrip()
+        # Read in large chunks, anything after ENDMSG is kept for the next reply
+        while (idx := self.rxbuf.find(ENDMSG)) < 0:
+            chunk = self.tcl.recv(4096)
+            if not chunk:
+                raise Exception("Error: OpenOCD closed the TCL connection")
+            self.rxbuf += chunk
+        data = self.rxbuf[:idx].decode("ascii").rstrip()
+        del self.rxbuf[:idx+1]
         return data
 
     def trst(self):
@@ -86,42 +170,63 @@ class OpenOCD:
             raise Exception("Error: failed to reset DTMCS (nonzero dmistat)")
 
     def write_dmi(self, address, data):
+        addr = address if isinstance(address, int) else int(address, 16)
         cmd = f"riscv dmi_write {address} {data}"
         rsp = self.capture(cmd)
         if "Failed" in rsp:
             raise Exception(rsp)
+        if 0x20 <= addr < 0x30:
+            self.progbuf.clear()  # progbuf written directly, write_progbuf's copy is stale
 
     def read_dmi(self, address):
-        cmd = f"riscv dmi_read {address}"
-        return self.capture(cmd)
+        return int(self.capture(f"riscv dmi_read {address}"), 16)
 
     def activate_dm(self):
-        self.write_dmi("0x10", "0x1")
-        dmstat = int(self.read_dmi("0x10"), 16)
+        rsp = self.send_script(["riscv dmi_write 0x10 0x1", "riscv dmi_read 0x10"])
+        dmstat = int(rsp[1], 16)
         if not dmstat & 0x1:
             raise Exception("Error: failed to activate debug module")
 
     def reset_dm(self):
-        self.write_dmi("0x10", "0x0")
-        dmstat = int(self.read_dmi("0x10"), 16)
+        rsp = self.send_script(["riscv dmi_write 0x10 0x0", "riscv dmi_read 0x10"])
+        dmstat = int(rsp[1], 16)
         if dmstat & 0x1:
             raise Exception("Error: failed to deactivate debug module")
+        self.progbuf.clear()
         self.activate_dm()
 
     def reset_hart(self):
-        self.write_dmi("0x10", "0x3")
-        self.write_dmi("0x10", "0x1")
-        dmstat = int(self.read_dmi("0x11"), 16)  # check HaveReset
+        rsp = self.send_script([
+            "riscv dmi_write 0x10 0x3",
+            "riscv dmi_write 0x10 0x1",
+            "riscv dmi_read 0x11",  # check HaveReset
+            "riscv dmi_write 0x10 0x10000001",  # ack HaveReset
+        ])
+        dmstat = int(rsp[2], 16)
         if not ((dmstat >> 18) & 0x3):
             raise Exception("Error: Hart failed to reset")
-        self.write_dmi("0x10", "0x10000001")  # ack HaveReset
+        self.stepping = False  # DCSR is reset with the hart
+        self.progbuf.clear()
 
-    def write_progbuf(self, data):
+    def write_progbuf(self, data, execute=False):
+        """Write instructions to the program buffer.
+        If execute is set, the program buffer is also executed in the same round-trip"""
         #TODO query progbuf size and error if len(data) is greater
         baseaddr = 0x20
-        for idx, instr in enumerate(data):
-            z = hex(baseaddr+idx) #debug
-            self.write_dmi(hex(baseaddr+idx), instr)
+        data = [int(instr, 16) if isinstance(instr, str) else instr for instr in data]
+        # Skip instructions that are already in the program buffer
+        cmds = [f"riscv dmi_write {hex(baseaddr+idx)} {hex(instr)}" for idx, instr in enumerate(data)
+                if self.progbuf.get(idx) != instr]
+        if execute:
+            cmds.append(f"riscv dmi_write 0x17 {hex(0x1 << 18)}")
+        # Writing progbuf while an abstract command is executing sets CmdErr
+        cmds.append("riscv dmi_read 0x16")
+        # Don't know which writes land if the script fails, only cache the contents after success
+        self.progbuf.clear()
+        abstractcs = int(self.send_script(cmds)[-1], 16)
+        if acerr := self.check_abstrcmderr(abstractcs):
+            raise AbstractCommandError(acerr)
+        self.progbuf.update(enumerate(data))
 
     def exec_progbuf(self):
         self.write_dmi("0x17", hex(0x1 << 18))
@@ -133,88 +238,166 @@ class OpenOCD:
         self.write_dmi("0x10", "0x5")
 
     def halt(self):
-        self.write_dmi("0x10", "0x80000001")
-        dmstat = int(self.read_dmi("0x11"), 16)  # Check halted bit
+        rsp = self.send_script(HALT_SCRIPT)
+        dmstat = int(rsp[1], 16)
         if not ((dmstat >> 8) & 0x3):
             raise Exception("Error: Hart failed to halt")
-        self.write_dmi("0x10", "0x1")  # Deassert HaltReq
+
+    def halt_and_snapshot(self, registers):
+        """Halt the hart and read several registers in the same round-trip.
+        Returns a dict like read_data_batch()"""
+        return self.read_data_batch(registers, halt=True)
 
     def resume(self):
-        self.write_dmi("0x10", "0x40000001")  # Send resume command
-        dmstat = int(self.read_dmi("0x11"), 16)  # Check resumeack bit
+        if self.stepping:
+            self.clear_step()
+        rsp = self.send_script([
+            "riscv dmi_write 0x10 0x40000001",  # Send resume command
+            "riscv dmi_read 0x11",  # Check resumeack bit
+        ])
+        dmstat = int(rsp[1], 16)
         if not ((dmstat >> 16) & 0x3):
             raise Exception("Error: Hart failed to resume")
 
     def step(self):
+        """Single step the hart. The DCSR step bit is left set so consecutive steps
+        only need the resume request, resume() clears it again"""
         # Set step bit if it isn't already set
-        dcsr = int(self.read_data("DCSR"), 16)
-        if not (dcsr >> 2) & 0x1:
-            dcsr |= 0x4
-            self.write_data("DCSR", hex(dcsr))
+        if not self.stepping:
+            dcsr = int(self.read_data("DCSR"), 16)
+            self.write_data("DCSR", hex(dcsr | 0x4))
+            self.stepping = True
         # Resume once
         self.write_dmi("0x10", "0x40000001")
-        # Unset step bit
-        dcsr &= ~0x4
-        self.write_data("DCSR", hex(dcsr))
+
+    def clear_step(self):
+        """Unset the DCSR step bit left by step()"""
+        # DCSR is re-read since prv may have changed while stepping
+        dcsr = int(self.read_data("DCSR"), 16)
+        self.write_data("DCSR", hex(dcsr & ~0x4))
 
     def access_register(self, write, regno, addr_size=None):
+        data = self.access_register_command(write, regno, addr_size)
+        self.write_dmi("0x17", hex(data))
+
+    def access_register_command(self, write, regno, addr_size=None):
+        """Build the Access Register abstract command (3.7.1.1)"""
         data = 1 << 17  # transfer bit always set
         if not addr_size:
             addr_size = self.LLEN
-        elif addr_size not in (32, 64, 128):
+        elif addr_size not in AARSIZE:
             raise Exception("must provide valid register access size (32, 64, 128). See: 3.7.1.1 aarsize")
-        data += int(math.log2(addr_size // 8)) << 20
+        data += AARSIZE[addr_size]
         data += write << 16
         data += regno
-        self.write_dmi("0x17", hex(data))  
+        return data
 
     def write_data(self, register, data):
         """Write data to specified register"""
         # Write data to 32 bit message registers
         data = int(data, 16)
-        self.write_dmi("0x4", hex(data & 0xffffffff))
-        if self.LLEN >= 64:
-            self.write_dmi("0x5", hex((data >> 32) & 0xffffffff))
-        if self.LLEN == 128:
-            self.write_dmi("0x6", hex((data >> 64) & 0xffffffff))
-            self.write_dmi("0x7", hex((data >> 96) & 0xffffffff))
+        cmds = [f"riscv dmi_write {addr} {hex((data >> 32*idx) & 0xffffffff)}" for idx, addr in enumerate(self.data_regs)]
         # Translate register alias to DM regno
         regno = translate_regno(register)
+        if regno in self.unimplemented_regs:
+            raise AbstractCommandError("exception")
         # Transfer data from msg registers to target register
-        self.access_register(write=True, regno=regno)
+        cmds.append(f"riscv dmi_write 0x17 {hex(self.access_write | regno)}")
+        cmds.append("riscv dmi_read 0x16")
+        abstractcs = int(self.send_script(cmds)[-1], 16)
         # Check that operations completed without error
-        if acerr := self.check_abstrcmderr():
-            raise Exception(acerr)
+        if acerr := self.check_abstrcmderr(abstractcs):
+            if acerr == "exception":
+                self.unimplemented_regs.add(regno)
+            raise AbstractCommandError(acerr)
+        if regno == register_translations["DCSR"]:
+            self.stepping = False  # DCSR now holds what the caller wrote, step() no longer owns the step bit
 
     def read_data(self, register):
         """Read data from specified register"""
         # Translate register alias to DM regno
         regno = translate_regno(register)
-        # Transfer data from target register to msg registers
-        self.access_register(write=False, regno=regno)
+        if regno in self.unimplemented_regs:
+            raise AbstractCommandError("exception")
+        # Transfer data from target register to msg registers, then wait for the transfer to finish
+        cmds = [f"riscv dmi_write 0x17 {hex(self.access_read | regno)}", ABSTRCMD_WAIT]
         # Read data from 32 bit message registers
-        data = ""
-        data = self.read_dmi("0x4").replace("0x", "").zfill(8)
-        if self.LLEN >= 64:
-            data = self.read_dmi("0x5").replace("0x", "").zfill(8) + data
-        if self.LLEN == 128:
-            data = self.read_dmi("0x6").replace("0x", "").zfill(8) + data
-            data = self.read_dmi("0x7").replace("0x", "").zfill(8) + data
+        cmds += [f"riscv dmi_read {addr}" for addr in self.data_regs]
+        cmds.append("riscv dmi_read 0x16")
+        rsp = self.send_script(cmds)
+        words, abstractcs = rsp[2:-1], int(rsp[-1], 16)
         # Check that operations completed without error
-        if acerr := self.check_abstrcmderr():
-            raise Exception(acerr)
-        return f"0x{data}"
-
-    def check_abstrcmderr(self):
-        """These errors must be cleared using clear_abstrcmd_err() before another OP can be executed"""
-        abstractcs = int(self.read_dmi("0x16"), 16)
+        if acerr := self.check_abstrcmderr(abstractcs):
+            if acerr == "exception":
+                self.unimplemented_regs.add(regno)
+            raise AbstractCommandError(acerr)
+        data = 0
+        for word in reversed(words):
+            data = (data << 32) | int(word, 16)
+        return f"0x{data:0{self.LLEN // 4}x}"
+
+    def read_data_batch(self, registers, halt=False):
+        """Read several registers in a single round-trip.
+        Returns a dict of register: data, registers that aren't implemented are left out.
+        If halt is set, the hart is halted at the start of the same script"""
+        regnos = {}
+        for register in registers:
+            regno = translate_regno(register)
+            if regno not in self.unimplemented_regs:
+                regnos[register] = regno
+        # Each register is transferred, read out once Busy clears, then CmdErr is checked and
+        # cleared so that an unimplemented register doesn't block the rest of the script
+        cmds = list(HALT_SCRIPT) if halt else []
+        for regno in regnos.values():
+            cmds.append(f"riscv dmi_write 0x17 {hex(self.access_read | regno)}")
+            cmds.append(ABSTRCMD_WAIT)
+            cmds += [f"riscv dmi_read {addr}" for addr in self.data_regs]
+            cmds.append("riscv dmi_read 0x16")
+            cmds.append("riscv dmi_write 0x16 0x700")
+        rsp = self.send_script(cmds)
+        if halt:
+            dmstat = int(rsp[1], 16)
+            if not ((dmstat >> 8) & 0x3):
+                raise Exception("Error: Hart failed to halt")
+            rsp = rsp[len(HALT_SCRIPT):]
+        values = {}
+        stride = len(self.data_regs) + 4
+        for idx, (register, regno) in enumerate(regnos.items()):
+            words = rsp[idx*stride+2:(idx+1)*stride-1]
+            abstractcs = int(words.pop(), 16)
+            if abstractcs >> 12 & 0x1 or cmderr_translations[abstractcs >> 8 & 0x7] == "busy":
+                # Still Busy after ABSTRCMD_WAIT: data is stale, the CmdErr clear was dropped and
+                # the following commands were rejected. Read the remaining registers one at a time
+                if self.check_abstrcmderr():  # waits for Busy to clear
+                    self.clear_abstrcmd_err()
+                for register in list(regnos)[idx:]:
+                    try:
+                        values[register] = self.read_data(register)
+                    except AbstractCommandError as e:
+                        if e.args[0] != "exception":
+                            raise e
+                        self.clear_abstrcmd_err()
+                return values
+            if acerr := cmderr_translations[abstractcs >> 8 & 0x7]:
+                if acerr != "exception":
+                    raise AbstractCommandError(acerr)
+                self.unimplemented_regs.add(regno)
+                continue
+            data = 0
+            for word in reversed(words):
+                data = (data << 32) | int(word, 16)
+            values[register] = f"0x{data:0{self.LLEN // 4}x}"
+        return values
+
+    def check_abstrcmderr(self, abstractcs=None):
+        """These errors must be cleared using clear_abstrcmd_err() before another OP can be executed.
+        Pass abstractcs if it was already read in the same script as the abstract command"""
+        if abstractcs is None:
+            abstractcs = int(self.send(ABSTRACTCS_READ_SCRIPT), 16)
         # CmdErr is only valid if Busy is 0
-        while True:
-            if not bool((abstractcs & 0x1000) >> 12):  # if not Busy
-                break
-            time.sleep(0.05)
-            abstractcs = int(self.read_dmi("0x16"), 16)
-        return cmderr_translations[(abstractcs & 0x700) >> 8]
+        while abstractcs >> 12 & 0x1:  # while Busy
+            abstractcs = int(self.send(ABSTRCMD_POLL_SCRIPT), 16)
+        return cmderr_translations[abstractcs >> 8 & 0x7]
 
     def clear_abstrcmd_err(self):
         self.write_dmi("0x16", "0x700")
@@ -232,6 +415,7 @@ class SVF_Generator:
         self.XLEN = XLEN
         self.INSTR = 0x01
         self.DCSR = 0x0
+        self.lines = []  # SVF output is collected and written out in one go on exit
 
     def __enter__(self):
         if self.writeout:
@@ -241,14 +425,15 @@ class SVF_Generator:
         return self
 
     def __exit__(self, type, value, traceback):
+        svf = "".join(f"{line}\n" for line in self.lines)
         if self.writeout:
+            self.file.write(svf)
             self.file.close()
+        else:
+            sys.stdout.write(svf)
 
     def print_svf(self, svf):
-        if self.file:
-            print(svf, file=self.file)
-        else:
-            print(svf)
+        self.lines.append(svf)
 
     def comment(self, comment):
         self.print_svf(f"// {comment}")
@@ -345,14 +530,14 @@ class SVF_Generator:
 
     def access_register(self, write, regno):
         data = 1 << 17  # transfer bit always set
-        data += int(math.log2(self.XLEN // 8)) << 20
+        data += AARSIZE[self.XLEN]
         data += int(write) << 16
         data += regno
-        self.write_dmi("0x17", hex(data))
+        self.write_dmi(0x17, data)
         self.spin(self.XLEN)  # required wait duration depends on which register was accessed
 
     def write_data(self, register, data):
-        if data > 0 and math.log2(data) > self.XLEN:
+        if data >> self.XLEN:
             raise Exception(f"Error: value passed to write_data ({data}) exceeds XLEN")
         self.write_dmi("0x4", data & 0xffffffff)
         if self.XLEN >= 64:
@@ -380,255 +565,275 @@ class SVF_Generator:
 
 
 
+def tcl_connected(tcl):
+    """Check that OpenOCD hasn't closed a kept TCL connection"""
+    try:
+        return tcl.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) != b""
+    except BlockingIOError:
+        return True  # Open with nothing to read
+    except OSError:
+        return False
+
+
+def close_tcl(tcl):
+    try:
+        # OpenOCD drops the connection on exit without replying, don't wait for one
+        tcl.sendall(b"exit" + ENDMSG)
+    except OSError:
+        pass
+    finally:
+        tcl.close()
+
+
+@atexit.register
+def close_persistent_tcl():
+    if persistent_tcl:
+        close_tcl(persistent_tcl)
+
+
 def translate_regno(register):
-    if register in register_translations:
-        return int(register_translations[register], 16)
-    elif register in abi_translations:
-        register = abi_translations[register]
-        return int(register_translations[register], 16)
-    else:
-        return None
+    return regno_translations.get(register)
 
 
 # 6.1.4 dtmcs errinfo translation table
-errinfo_translations = {
-    0 : "not implemented",
-    1 : "dmi error",
-    2 : "communication error",
-    3 : "device error",
-    4 : "unknown",
-}
+errinfo_translations = (
+    "not implemented",      # 0
+    "dmi error",            # 1
+    "communication error",  # 2
+    "device error",         # 3
+    "unknown",              # 4
+)
 
 # 6.1.5 DMI op translation table
-op_translations = {
-    0 : "success",
-    1 : "reserved",
-    2 : "failed",
-    3 : "busy",
-}
+op_translations = (
+    "success",   # 0
+    "reserved",  # 1
+    "failed",    # 2
+    "busy",      # 3
+)
 
 # 3.14.6 Abstract command CmdErr value translation table
-cmderr_translations = {
-    0 : None,
-    1 : "busy",
-    2 : "not supported",
-    3 : "exception",
-    4 : "halt/resume",
-    5 : "bus",
-    6 : "reserved",
-    7 : "other",
-}
+cmderr_translations = (
+    None,             # 0
+    "busy",           # 1
+    "not supported",  # 2
+    "exception",      # 3
+    "halt/resume",    # 4
+    "bus",            # 5
+    "reserved",       # 6
+    "other",          # 7
+)
 
 # Register alias to regno translation table
 register_translations = {
-    "FFLAGS"         : "0x0001",
-    "FRM"            : "0x0002",
-    "FCSR"           : "0x0003",
-    "MSTATUS"        : "0x0300",
-    "MISA"           : "0x0301",
-    "MEDELEG"        : "0x0302",
-    "MIDELEG"        : "0x0303",
-    "MIE"            : "0x0304",
-    "MTVEC"          : "0x0305",
-    "MCOUNTEREN"     : "0x0306",
-    "MENVCFG"        : "0x030A",
-    "MSTATUSH"       : "0x0310",
-    "MENVCFGH"       : "0x031A",
-    "MCOUNTINHIBIT"  : "0x0320",
-    "MSCRATCH"       : "0x0340",
-    "MEPC"           : "0x0341",
-    "MCAUSE"         : "0x0342",
-    "MTVAL"          : "0x0343",
-    "MIP"            : "0x0344",
-    "PMPCFG0"        : "0x03A0",
-    "PMPCFG1"        : "0x03A1",
-    "PMPCFG2"        : "0x03A2",
-    "PMPCFG3"        : "0x03A3",
-    "PMPCFG4"        : "0x03A4",
-    "PMPCFG5"        : "0x03A5",
-    "PMPCFG6"        : "0x03A6",
-    "PMPCFG7"        : "0x03A7",
-    "PMPCFG8"        : "0x03A8",
-    "PMPCFG9"        : "0x03A9",
-    "PMPCFGA"        : "0x03AA",
-    "PMPCFGB"        : "0x03AB",
-    "PMPCFGC"        : "0x03AC",
-    "PMPCFGD"        : "0x03AD",
-    "PMPCFGE"        : "0x03AE",
-    "PMPCFGF"        : "0x03AF",
-    "PMPADDR0"       : "0x03B0",
-    "PMPADDR1"       : "0x03B1",
-    "PMPADDR2"       : "0x03B2",
-    "PMPADDR3"       : "0x03B3",
-    "PMPADDR4"       : "0x03B4",
-    "PMPADDR5"       : "0x03B5",
-    "PMPADDR6"       : "0x03B6",
-    "PMPADDR7"       : "0x03B7",
-    "PMPADDR8"       : "0x03B8",
-    "PMPADDR9"       : "0x03B9",
-    "PMPADDRA"       : "0x03BA",
-    "PMPADDRB"       : "0x03BB",
-    "PMPADDRC"       : "0x03BC",
-    "PMPADDRD"       : "0x03BD",
-    "PMPADDRE"       : "0x03BE",
-    "PMPADDRF"       : "0x03BF",
-    "PMPADDR10"      : "0x03C0",
-    "PMPADDR11"      : "0x03C1",
-    "PMPADDR12"      : "0x03C2",
-    "PMPADDR13"      : "0x03C3",
-    "PMPADDR14"      : "0x03C4",
-    "PMPADDR15"      : "0x03C5",
-    "PMPADDR16"      : "0x03C6",
-    "PMPADDR17"      : "0x03C7",
-    "PMPADDR18"      : "0x03C8",
-    "PMPADDR19"      : "0x03C9",
-    "PMPADDR1A"      : "0x03CA",
-    "PMPADDR1B"      : "0x03CB",
-    "PMPADDR1C"      : "0x03CC",
-    "PMPADDR1D"      : "0x03CD",
-    "PMPADDR1E"      : "0x03CE",
-    "PMPADDR1F"      : "0x03CF",
-    "PMPADDR20"      : "0x03D0",
-    "PMPADDR21"      : "0x03D1",
-    "PMPADDR22"      : "0x03D2",
-    "PMPADDR23"      : "0x03D3",
-    "PMPADDR24"      : "0x03D4",
-    "PMPADDR25"      : "0x03D5",
-    "PMPADDR26"      : "0x03D6",
-    "PMPADDR27"      : "0x03D7",
-    "PMPADDR28"      : "0x03D8",
-    "PMPADDR29"      : "0x03D9",
-    "PMPADDR2A"      : "0x03DA",
-    "PMPADDR2B"      : "0x03DB",
-    "PMPADDR2C"      : "0x03DC",
-    "PMPADDR2D"      : "0x03DD",
-    "PMPADDR2E"      : "0x03DE",
-    "PMPADDR2F"      : "0x03DF",
-    "PMPADDR30"      : "0x03E0",
-    "PMPADDR31"      : "0x03E1",
-    "PMPADDR32"      : "0x03E2",
-    "PMPADDR33"      : "0x03E3",
-    "PMPADDR34"      : "0x03E4",
-    "PMPADDR35"      : "0x03E5",
-    "PMPADDR36"      : "0x03E6",
-    "PMPADDR37"      : "0x03E7",
-    "PMPADDR38"      : "0x03E8",
-    "PMPADDR39"      : "0x03E9",
-    "PMPADDR3A"      : "0x03EA",
-    "PMPADDR3B"      : "0x03EB",
-    "PMPADDR3C"      : "0x03EC",
-    "PMPADDR3D"      : "0x03ED",
-    "PMPADDR3E"      : "0x03EE",
-    "PMPADDR3F"      : "0x03EF",
-    "TSELECT"        : "0x07A0",
-    "TDATA1"         : "0x07A1",
-    "TDATA2"         : "0x07A2",
-    "TDATA3"         : "0x07A3",
-    "DCSR"           : "0x07B0",
-    "DPC"            : "0x07B1",
-    "MVENDORID"      : "0x0F11",
-    "MARCHID"        : "0x0F12",
-    "MIMPID"         : "0x0F13",
-    "MHARTID"        : "0x0F14",
-    "MCONFIGPTR"     : "0x0F15",
-    "SIP"            : "0x0144",
-    "MIP"            : "0x0344",
-    "MHPMEVENTBASE"    : "0x0320",
-    "MHPMCOUNTERBASE"  : "0x0B00",
-    "MHPMCOUNTERHBASE" : "0x0B80",
-    "HPMCOUNTERBASE"   : "0x0C00",
-    "TIME"             : "0x0C01",
-    "HPMCOUNTERHBASE"  : "0x0C80",
-    "TIMEH"            : "0x0C81",
-    "SSTATUS"        : "0x0100",
-    "SIE"            : "0x0104",
-    "STVEC"          : "0x0105",
-    "SCOUNTEREN"     : "0x0106",
-    "SENVCFG"        : "0x010A",
-    "SSCRATCH"       : "0x0140",
-    "SEPC"           : "0x0141",
-    "SCAUSE"         : "0x0142",
-    "STVAL"          : "0x0143",
-    "SIP"            : "0x0144",
-    "STIMECMP"       : "0x014D",
-    "STIMECMPH"      : "0x015D",
-    "SATP"           : "0x0180",
-    "SIE"            : "0x0104",
-    "SIP"            : "0x0144",
-    "MIE"            : "0x0304",
-    "MIP"            : "0x0344",
-    "TRAPM"       : "0xC000",
-    "PCM"         : "0xC001",
-    "INSTRM"      : "0xC002",
-    "MEMRWM"      : "0xC003",
-    "INSTRVALIDM" : "0xC004",
-    "WRITEDATAM"  : "0xC005",
-    "IEUADRM"     : "0xC006",
-    "READDATAM"   : "0xC007",
-    "X0"          : "0x1000",
-    "X1"          : "0x1001",
-    "X2"          : "0x1002",
-    "X3"          : "0x1003",
-    "X4"          : "0x1004",
-    "X5"          : "0x1005",
-    "X6"          : "0x1006",
-    "X7"          : "0x1007",
-    "X8"          : "0x1008",
-    "X9"          : "0x1009",
-    "X10"         : "0x100A",
-    "X11"         : "0x100B",
-    "X12"         : "0x100C",
-    "X13"         : "0x100D",
-    "X14"         : "0x100E",
-    "X15"         : "0x100F",
-    "X16"         : "0x1010",
-    "X17"         : "0x1011",
-    "X18"         : "0x1012",
-    "X19"         : "0x1013",
-    "X20"         : "0x1014",
-    "X21"         : "0x1015",
-    "X22"         : "0x1016",
-    "X23"         : "0x1017",
-    "X24"         : "0x1018",
-    "X25"         : "0x1019",
-    "X26"         : "0x101A",
-    "X27"         : "0x101B",
-    "X28"         : "0x101C",
-    "X29"         : "0x101D",
-    "X30"         : "0x101E",
-    "X31"         : "0x101F",
-    "F0"          : "0x1020",
-    "F1"          : "0x1021",
-    "F2"          : "0x1022",
-    "F3"          : "0x1023",
-    "F4"          : "0x1024",
-    "F5"          : "0x1025",
-    "F6"          : "0x1026",
-    "F7"          : "0x1027",
-    "F8"          : "0x1028",
-    "F9"          : "0x1029",
-    "F10"         : "0x102A",
-    "F11"         : "0x102B",
-    "F12"         : "0x102C",
-    "F13"         : "0x102D",
-    "F14"         : "0x102E",
-    "F15"         : "0x102F",
-    "F16"         : "0x1030",
-    "F17"         : "0x1031",
-    "F18"         : "0x1032",
-    "F19"         : "0x1033",
-    "F20"         : "0x1034",
-    "F21"         : "0x1035",
-    "F22"         : "0x1036",
-    "F23"         : "0x1037",
-    "F24"         : "0x1038",
-    "F25"         : "0x1039",
-    "F26"         : "0x103A",
-    "F27"         : "0x103B",
-    "F28"         : "0x103C",
-    "F29"         : "0x103D",
-    "F30"         : "0x103E",
-    "F31"         : "0x103F",
+    "FFLAGS"         : 0x0001,
+    "FRM"            : 0x0002,
+    "FCSR"           : 0x0003,
+    "MSTATUS"        : 0x0300,
+    "MISA"           : 0x0301,
+    "MEDELEG"        : 0x0302,
+    "MIDELEG"        : 0x0303,
+    "MIE"            : 0x0304,
+    "MTVEC"          : 0x0305,
+    "MCOUNTEREN"     : 0x0306,
+    "MENVCFG"        : 0x030A,
+    "MSTATUSH"       : 0x0310,
+    "MENVCFGH"       : 0x031A,
+    "MCOUNTINHIBIT"  : 0x0320,
+    "MSCRATCH"       : 0x0340,
+    "MEPC"           : 0x0341,
+    "MCAUSE"         : 0x0342,
+    "MTVAL"          : 0x0343,
+    "MIP"            : 0x0344,
+    "PMPCFG0"        : 0x03A0,
+    "PMPCFG1"        : 0x03A1,
+    "PMPCFG2"        : 0x03A2,
+    "PMPCFG3"        : 0x03A3,
+    "PMPCFG4"        : 0x03A4,
+    "PMPCFG5"        : 0x03A5,
+    "PMPCFG6"        : 0x03A6,
+    "PMPCFG7"        : 0x03A7,
+    "PMPCFG8"        : 0x03A8,
+    "PMPCFG9"        : 0x03A9,
+    "PMPCFGA"        : 0x03AA,
+    "PMPCFGB"        : 0x03AB,
+    "PMPCFGC"        : 0x03AC,
+    "PMPCFGD"        : 0x03AD,
+    "PMPCFGE"        : 0x03AE,
+    "PMPCFGF"        : 0x03AF,
+    "PMPADDR0"       : 0x03B0,
+    "PMPADDR1"       : 0x03B1,
+    "PMPADDR2"       : 0x03B2,
+    "PMPADDR3"       : 0x03B3,
+    "PMPADDR4"       : 0x03B4,
+    "PMPADDR5"       : 0x03B5,
+    "PMPADDR6"       : 0x03B6,
+    "PMPADDR7"       : 0x03B7,
+    "PMPADDR8"       : 0x03B8,
+    "PMPADDR9"       : 0x03B9,
+    "PMPADDRA"       : 0x03BA,
+    "PMPADDRB"       : 0x03BB,
+    "PMPADDRC"       : 0x03BC,
+    "PMPADDRD"       : 0x03BD,
+    "PMPADDRE"       : 0x03BE,
+    "PMPADDRF"       : 0x03BF,
+    "PMPADDR10"      : 0x03C0,
+    "PMPADDR11"      : 0x03C1,
+    "PMPADDR12"      : 0x03C2,
+    "PMPADDR13"      : 0x03C3,
+    "PMPADDR14"      : 0x03C4,
+    "PMPADDR15"      : 0x03C5,
+    "PMPADDR16"      : 0x03C6,
+    "PMPADDR17"      : 0x03C7,
+    "PMPADDR18"      : 0x03C8,
+    "PMPADDR19"      : 0x03C9,
+    "PMPADDR1A"      : 0x03CA,
+    "PMPADDR1B"      : 0x03CB,
+    "PMPADDR1C"      : 0x03CC,
+    "PMPADDR1D"      : 0x03CD,
+    "PMPADDR1E"      : 0x03CE,
+    "PMPADDR1F"      : 0x03CF,
+    "PMPADDR20"      : 0x03D0,
+    "PMPADDR21"      : 0x03D1,
+    "PMPADDR22"      : 0x03D2,
+    "PMPADDR23"      : 0x03D3,
+    "PMPADDR24"      : 0x03D4,
+    "PMPADDR25"      : 0x03D5,
+    "PMPADDR26"      : 0x03D6,
+    "PMPADDR27"      : 0x03D7,
+    "PMPADDR28"      : 0x03D8,
+    "PMPADDR29"      : 0x03D9,
+    "PMPADDR2A"      : 0x03DA,
+    "PMPADDR2B"      : 0x03DB,
+    "PMPADDR2C"      : 0x03DC,
+    "PMPADDR2D"      : 0x03DD,
+    "PMPADDR2E"      : 0x03DE,
+    "PMPADDR2F"      : 0x03DF,
+    "PMPADDR30"      : 0x03E0,
+    "PMPADDR31"      : 0x03E1,
+    "PMPADDR32"      : 0x03E2,
+    "PMPADDR33"      : 0x03E3,
+    "PMPADDR34"      : 0x03E4,
+    "PMPADDR35"      : 0x03E5,
+    "PMPADDR36"      : 0x03E6,
+    "PMPADDR37"      : 0x03E7,
+    "PMPADDR38"      : 0x03E8,
+    "PMPADDR39"      : 0x03E9,
+    "PMPADDR3A"      : 0x03EA,
+    "PMPADDR3B"      : 0x03EB,
+    "PMPADDR3C"      : 0x03EC,
+    "PMPADDR3D"      : 0x03ED,
+    "PMPADDR3E"      : 0x03EE,
+    "PMPADDR3F"      : 0x03EF,
+    "TSELECT"        : 0x07A0,
+    "TDATA1"         : 0x07A1,
+    "TDATA2"         : 0x07A2,
+    "TDATA3"         : 0x07A3,
+    "DCSR"           : 0x07B0,
+    "DPC"            : 0x07B1,
+    "MVENDORID"      : 0x0F11,
+    "MARCHID"        : 0x0F12,
+    "MIMPID"         : 0x0F13,
+    "MHARTID"        : 0x0F14,
+    "MCONFIGPTR"     : 0x0F15,
+    "SIP"            : 0x0144,
+    "MIP"            : 0x0344,
+    "MHPMEVENTBASE"    : 0x0320,
+    "MHPMCOUNTERBASE"  : 0x0B00,
+    "MHPMCOUNTERHBASE" : 0x0B80,
+    "HPMCOUNTERBASE"   : 0x0C00,
+    "TIME"             : 0x0C01,
+    "HPMCOUNTERHBASE"  : 0x0C80,
+    "TIMEH"            : 0x0C81,
+    "SSTATUS"        : 0x0100,
+    "SIE"            : 0x0104,
+    "STVEC"          : 0x0105,
+    "SCOUNTEREN"     : 0x0106,
+    "SENVCFG"        : 0x010A,
+    "SSCRATCH"       : 0x0140,
+    "SEPC"           : 0x0141,
+    "SCAUSE"         : 0x0142,
+    "STVAL"          : 0x0143,
+    "SIP"            : 0x0144,
+    "STIMECMP"       : 0x014D,
+    "STIMECMPH"      : 0x015D,
+    "SATP"           : 0x0180,
+    "SIE"            : 0x0104,
+    "SIP"            : 0x0144,
+    "MIE"            : 0x0304,
+    "MIP"            : 0x0344,
+    "TRAPM"       : 0xC000,
+    "PCM"         : 0xC001,
+    "INSTRM"      : 0xC002,
+    "MEMRWM"      : 0xC003,
+    "INSTRVALIDM" : 0xC004,
+    "WRITEDATAM"  : 0xC005,
+    "IEUADRM"     : 0xC006,
+    "READDATAM"   : 0xC007,
+    "X0"          : 0x1000,
+    "X1"          : 0x1001,
+    "X2"          : 0x1002,
+    "X3"          : 0x1003,
+    "X4"          : 0x1004,
+    "X5"          : 0x1005,
+    "X6"          : 0x1006,
+    "X7"          : 0x1007,
+    "X8"          : 0x1008,
+    "X9"          : 0x1009,
+    "X10"         : 0x100A,
+    "X11"         : 0x100B,
+    "X12"         : 0x100C,
+    "X13"         : 0x100D,
+    "X14"         : 0x100E,
+    "X15"         : 0x100F,
+    "X16"         : 0x1010,
+    "X17"         : 0x1011,
+    "X18"         : 0x1012,
+    "X19"         : 0x1013,
+    "X20"         : 0x1014,
+    "X21"         : 0x1015,
+    "X22"         : 0x1016,
+    "X23"         : 0x1017,
+    "X24"         : 0x1018,
+    "X25"         : 0x1019,
+    "X26"         : 0x101A,
+    "X27"         : 0x101B,
+    "X28"         : 0x101C,
+    "X29"         : 0x101D,
+    "X30"         : 0x101E,
+    "X31"         : 0x101F,
+    "F0"          : 0x1020,
+    "F1"          : 0x1021,
+    "F2"          : 0x1022,
+    "F3"          : 0x1023,
+    "F4"          : 0x1024,
+    "F5"          : 0x1025,
+    "F6"          : 0x1026,
+    "F7"          : 0x1027,
+    "F8"          : 0x1028,
+    "F9"          : 0x1029,
+    "F10"         : 0x102A,
+    "F11"         : 0x102B,
+    "F12"         : 0x102C,
+    "F13"         : 0x102D,
+    "F14"         : 0x102E,
+    "F15"         : 0x102F,
+    "F16"         : 0x1030,
+    "F17"         : 0x1031,
+    "F18"         : 0x1032,
+    "F19"         : 0x1033,
+    "F20"         : 0x1034,
+    "F21"         : 0x1035,
+    "F22"         : 0x1036,
+    "F23"         : 0x1037,
+    "F24"         : 0x1038,
+    "F25"         : 0x1039,
+    "F26"         : 0x103A,
+    "F27"         : 0x103B,
+    "F28"         : 0x103C,
+    "F29"         : 0x103D,
+    "F30"         : 0x103E,
+    "F31"         : 0x103F,
 }
 
 abi_translations = {
@@ -699,6 +904,16 @@ abi_translations = {
 }
 abi_translations |= dict(map(reversed, abi_translations.items())) # two way translations
 
+# Flattened register name to regno table used by translate_regno.
+# Adds the lowercase x/f names and their ABI names ("s0/fp" is reachable as both "s0" and "fp")
+regno_translations = dict(register_translations)
+for name, abi_name in abi_translations.items():
+    if name.upper() in register_translations:
+        regno = register_translations[name.upper()]
+        regno_translations[name] = regno
+        for alias in abi_name.split("/"):
+            regno_translations[alias] = regno
+
 nonstandard_register_lengths = {
     "TRAPM"       : 1,
     "INSTRM"      : 32,
@@ -706,3 +921,9 @@ nonstandard_register_lengths = {
     "INSTRVALIDM" : 1,
     "READDATAM"   : 64
 }
+
+# The translation tables are constant, make them read only
+register_translations = MappingProxyType(register_translations)
+abi_translations = MappingProxyType(abi_translations)
+regno_translations = MappingProxyType(regno_translations)
+nonstandard_register_lengths = MappingProxyType(nonstandard_register_lengths)